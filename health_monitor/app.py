@@ -4,57 +4,204 @@ Flask Web Dashboard for Health Monitoring System
 Run this alongside main_simulator.py to view data in browser
 """
 
-from flask import Flask, render_template, jsonify, request, send_from_directory
+from flask import (Flask, Response, render_template, request, send_from_directory,
+                   stream_with_context)
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
+import atexit
 import sqlite3
-from datetime import datetime, timedelta
-import json
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import orjson
 import os
+import threading
+from functools import partial
+
+from current_reading import read_current_reading
+from utc_time import TIMESTAMP_FORMAT, utc_cutoff, utc_today
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson for faster serialization"""
+    # Stored timestamps are naive UTC; emit them with an explicit offset
+    option = orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+# Return DATETIME columns (stored as UTC text) as datetime objects
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+
+# Short-lived response cache for the polled read-only endpoints. The
+# simulator writes from another process, so entries expire by TTL only.
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': 2})
 
 # Configuration
 DATABASE = 'health_data.db'
 STATIC_DIR = 'static'
 TEMPLATE_DIR = 'templates'
+EXPORT_CHUNK_SIZE = 500  # rows serialized per streamed chunk
 
-def get_db_connection():
-    """Create database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+# SQL statements, kept as constants so each connection's statement cache
+# reuses the prepared form instead of re-parsing on every request
+SQL_CURRENT = '''
+SELECT heart_rate, spo2, status, timestamp
+FROM readings
+ORDER BY timestamp DESC
+LIMIT 1
+'''
+
+SQL_HISTORY = '''
+SELECT timestamp, heart_rate, spo2, status
+FROM readings
+WHERE timestamp > ?
+ORDER BY timestamp DESC
+LIMIT ?
+'''
+
+SQL_TODAY_STATS = '''
+SELECT
+    count as total_readings,
+    sum_hr * 1.0 / count as avg_hr,
+    min_hr,
+    max_hr,
+    sum_spo2 * 1.0 / count as avg_spo2,
+    min_spo2,
+    max_spo2,
+    alerts as alert_count
+FROM daily_rollup
+WHERE day = ?
+'''
+
+SQL_ALL_TIME_STATS = '''
+SELECT
+    SUM(count) as total_readings,
+    SUM(sum_hr) * 1.0 / SUM(count) as avg_hr,
+    SUM(sum_spo2) * 1.0 / SUM(count) as avg_spo2
+FROM daily_rollup
+'''
+
+SQL_EXPORT_COUNT = '''
+SELECT COUNT(*) FROM readings
+WHERE timestamp > ?
+'''
+
+SQL_EXPORT = '''
+SELECT id, timestamp, heart_rate, spo2, status
+FROM readings
+WHERE timestamp > ?
+ORDER BY timestamp DESC
+'''
+
+# One read-only connection per worker thread, reused across requests.
+# Reuse needs long-lived threads (e.g. gunicorn gthread workers); the
+# Werkzeug dev server starts a thread per request, so there each request
+# opens its own handle and it is closed once that thread has exited.
+_connections = {}
+_connections_lock = threading.Lock()
+
+def get_db():
+    """Get this thread's database connection, opening it on first use"""
+    thread = threading.current_thread()
+    conn = _connections.get(thread)
+    if conn is None:
+        # Only the owning thread uses it; check_same_thread=False lets
+        # close_stale_connections close it after that thread is gone
+        conn = sqlite3.connect(DATABASE, detect_types=sqlite3.PARSE_DECLTYPES,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA query_only=1')
+        with _connections_lock:
+            close_stale_connections()
+            _connections[thread] = conn
     return conn
 
+def close_stale_connections(all_threads=False):
+    """Close connections owned by threads that have exited (or by all threads)"""
+    for thread in list(_connections):
+        if all_threads or not thread.is_alive():
+            _connections.pop(thread).close()
+
+atexit.register(close_stale_connections, all_threads=True)
+
+def json_response(payload):
+    """Serialize payload with orjson into a JSON response"""
+    return Response(orjson.dumps(payload, option=ORJSONProvider.option),
+                    mimetype='application/json')
+
 def init_db():
-    """Initialize database if it doesn't exist"""
-    if not os.path.exists(DATABASE):
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS readings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                heart_rate INTEGER,
-                spo2 INTEGER,
-                status TEXT
-            )
-        ''')
+    """Initialize database, seeding sample data if it doesn't exist"""
+    is_new = not os.path.exists(DATABASE)
+    conn = sqlite3.connect(DATABASE)
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS readings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            heart_rate INTEGER,
+            spo2 INTEGER,
+            status TEXT
+        )
+    ''')
+    
+    # Index for ORDER BY timestamp DESC / time-window queries
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_readings_ts
+        ON readings(timestamp DESC)
+    ''')
+    
+    # Per-day aggregates, updated on insert by the monitor
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            day DATE PRIMARY KEY,
+            count INTEGER,
+            sum_hr INTEGER,
+            sum_spo2 INTEGER,
+            min_hr INTEGER,
+            max_hr INTEGER,
+            min_spo2 INTEGER,
+            max_spo2 INTEGER,
+            alerts INTEGER
+        )
+    ''')
+    
+    if is_new:
+        # Add some sample data, 48 half-hour readings
+        i = np.arange(48)
+        hr = 75 + (i % 10) - 5
+        spo2 = 98 - (i % 3)
+        status = np.where((hr >= 60) & (hr <= 100) & (spo2 >= 95), "Normal", "Alert")
+        # UTC text, matching CURRENT_TIMESTAMP used by live readings
+        base_time = datetime.now(timezone.utc) - timedelta(hours=24)
+        timestamps = [(base_time + timedelta(minutes=30*n)).strftime(TIMESTAMP_FORMAT)
+                      for n in i.tolist()]
         
-        # Add some sample data
-        sample_data = []
-        base_time = datetime.now() - timedelta(hours=24)
-        for i in range(48):  # 48 half-hour readings
-            time_offset = base_time + timedelta(minutes=30*i)
-            hr = 75 + (i % 10) - 5
-            spo2 = 98 - (i % 3)
-            status = "Normal" if (60 <= hr <= 100 and spo2 >= 95) else "Alert"
-            sample_data.append((time_offset, hr, spo2, status))
-            
         cursor.executemany('''
             INSERT INTO readings (timestamp, heart_rate, spo2, status)
             VALUES (?, ?, ?, ?)
-        ''', sample_data)
-        
-        conn.commit()
-        conn.close()
+        ''', zip(timestamps, hr.tolist(), spo2.tolist(), status.tolist()))
+    
+    # Backfill the rollup from existing readings on first use
+    if cursor.execute('SELECT 1 FROM daily_rollup LIMIT 1').fetchone() is None:
+        cursor.execute('''
+            INSERT INTO daily_rollup
+            SELECT substr(timestamp, 1, 10), COUNT(*),
+                   SUM(heart_rate), SUM(spo2),
+                   MIN(heart_rate), MAX(heart_rate),
+                   MIN(spo2), MAX(spo2),
+                   SUM(status = 'Alert')
+            FROM readings
+            GROUP BY substr(timestamp, 1, 10)
+        ''')
+    
+    conn.commit()
+    conn.close()
+    if is_new:
         print("✅ Sample database created with test data")
 
 @app.route('/')
@@ -63,108 +210,85 @@ def index():
     return render_template('dashboard.html')
 
 @app.route('/api/current')
+@cache.cached(timeout=1)
 def get_current():
     """Get most recent reading"""
-    conn = get_db_connection()
+    # Served from the simulator's shared memory while it is publishing
+    reading = read_current_reading()
+    if reading:
+        return json_response(reading)
+    
+    conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT heart_rate, spo2, status, timestamp
-        FROM readings
-        ORDER BY timestamp DESC
-        LIMIT 1
-    ''')
+    cursor.execute(SQL_CURRENT)
     row = cursor.fetchone()
-    conn.close()
     
     if row:
-        return jsonify({
+        return json_response({
             'heart_rate': row['heart_rate'],
             'spo2': row['spo2'],
             'status': row['status'],
             'timestamp': row['timestamp']
         })
-    return jsonify({'error': 'No data available'})
+    return json_response({'error': 'No data available'})
 
 @app.route('/api/history')
+@cache.cached(timeout=3, query_string=True)
 def get_history():
     """Get historical readings"""
     hours = request.args.get('hours', 24, type=int)
     limit = request.args.get('limit', 100, type=int)
     
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT heart_rate, spo2, status, timestamp
-        FROM readings
-        WHERE timestamp > datetime('now', '-{} hours')
-        ORDER BY timestamp DESC
-        LIMIT {}
-    '''.format(hours, limit))
+    cursor.row_factory = None  # Plain tuples, transposed below
+    cursor.execute(SQL_HISTORY, (utc_cutoff(hours), limit))
     
     rows = cursor.fetchall()
-    conn.close()
-    
-    # Convert to list and reverse for chronological order
-    data = [{
-        'heart_rate': row['heart_rate'],
-        'spo2': row['spo2'],
-        'status': row['status'],
-        'timestamp': row['timestamp']
-    } for row in rows]
+    rows.reverse()  # Chronological order for charts
     
-    data.reverse()  # Chronological order for charts
+    # Columnar layout: one array per field instead of one object per row
+    t, hr, spo2, status = zip(*rows) if rows else ((), (), (), ())
     
-    return jsonify(data)
+    return json_response({
+        't': t,
+        'hr': hr,
+        'spo2': spo2,
+        'status': status
+    })
 
 @app.route('/api/statistics')
+@cache.cached(timeout=5)
 def get_statistics():
     """Get statistical summary"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     # Today's statistics
-    cursor.execute('''
-        SELECT 
-            COUNT(*) as total_readings,
-            AVG(heart_rate) as avg_hr,
-            MIN(heart_rate) as min_hr,
-            MAX(heart_rate) as max_hr,
-            AVG(spo2) as avg_spo2,
-            MIN(spo2) as min_spo2,
-            MAX(spo2) as max_spo2,
-            SUM(CASE WHEN status = 'Alert' THEN 1 ELSE 0 END) as alert_count
-        FROM readings
-        WHERE DATE(timestamp) = DATE('now')
-    ''')
+    cursor.execute(SQL_TODAY_STATS, (utc_today(),))
     
-    today_stats = cursor.fetchone()
+    # No row until the first reading of the day is recorded
+    today_stats = dict(cursor.fetchone() or {})
     
     # All-time statistics
-    cursor.execute('''
-        SELECT 
-            COUNT(*) as total_readings,
-            AVG(heart_rate) as avg_hr,
-            AVG(spo2) as avg_spo2
-        FROM readings
-    ''')
+    cursor.execute(SQL_ALL_TIME_STATS)
     
     all_time_stats = cursor.fetchone()
-    conn.close()
     
-    return jsonify({
+    return json_response({
         'today': {
-            'total_readings': today_stats['total_readings'] or 0,
-            'avg_hr': round(today_stats['avg_hr'] or 0, 1),
+            'total_readings': today_stats.get('total_readings') or 0,
+            'avg_hr': round(today_stats.get('avg_hr') or 0, 1),
             'hr_range': {
-                'min': today_stats['min_hr'] or 0,
-                'max': today_stats['max_hr'] or 0
+                'min': today_stats.get('min_hr') or 0,
+                'max': today_stats.get('max_hr') or 0
             },
-            'avg_spo2': round(today_stats['avg_spo2'] or 0, 1),
+            'avg_spo2': round(today_stats.get('avg_spo2') or 0, 1),
             'spo2_range': {
-                'min': today_stats['min_spo2'] or 0,
-                'max': today_stats['max_spo2'] or 0
+                'min': today_stats.get('min_spo2') or 0,
+                'max': today_stats.get('max_spo2') or 0
             },
-            'alert_count': today_stats['alert_count'] or 0
+            'alert_count': today_stats.get('alert_count') or 0
         },
         'all_time': {
             'total_readings': all_time_stats['total_readings'] or 0,
@@ -175,36 +299,47 @@ def get_statistics():
 
 @app.route('/api/export')
 def export_data():
-    """Export data as JSON"""
+    """Export data as JSON, streamed in chunks"""
     hours = request.args.get('hours', 24, type=int)
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM readings
-        WHERE timestamp > datetime('now', '-{} hours')
-        ORDER BY timestamp DESC
-    '''.format(hours))
+    dumps = partial(orjson.dumps, option=ORJSONProvider.option)
     
-    rows = cursor.fetchall()
-    conn.close()
-    
-    data = [{
-        'id': row['id'],
-        'timestamp': row['timestamp'],
-        'heart_rate': row['heart_rate'],
-        'spo2': row['spo2'],
-        'status': row['status']
-    } for row in rows]
-    
-    response = jsonify({
-        'export_date': datetime.now().isoformat(),
-        'record_count': len(data),
-        'data': data
-    })
+    def generate():
+        conn = get_db()
+        export_date = datetime.now(timezone.utc)
+        # Same cutoff for the count and the rows
+        since = (utc_cutoff(hours, now=export_date),)
+        
+        # One read snapshot so inserts between the two queries aren't seen
+        conn.execute('BEGIN')
+        try:
+            record_count = conn.execute(SQL_EXPORT_COUNT, since).fetchone()[0]
+            
+            # Emit the header object, leaving it open for the data array
+            header = dumps({
+                'export_date': export_date,
+                'record_count': record_count,
+                'columns': ['id', 'timestamp', 'heart_rate', 'spo2', 'status']
+            })
+            yield header[:-1] + b',"data":['
+            
+            cursor = conn.cursor()
+            cursor.row_factory = None  # Plain tuples, serialized as-is
+            cursor.execute(SQL_EXPORT, since)
+            
+            separator = b''
+            while rows := cursor.fetchmany(EXPORT_CHUNK_SIZE):
+                yield separator + b','.join(map(dumps, rows))
+                separator = b','
+            yield b']}'
+        finally:
+            conn.commit()
     
-    response.headers['Content-Disposition'] = 'attachment; filename=health_data_export.json'
-    return response
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/json',
+        headers={'Content-Disposition': 'attachment; filename=health_data_export.json'}
+    )
 
 # Serve static files (if needed)
 @app.route('/static/<path:path>')
@@ -230,5 +365,6 @@ if __name__ == '__main__':
     print("=" * 50)
     print("\nPress Ctrl+C to stop the server\n")
     
-    # Run Flask app
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Run Flask's development server; debugger and reloader only when
+    # FLASK_ENV=dev. Use a WSGI server such as gunicorn for deployment.
+    app.run(debug=os.getenv('FLASK_ENV') == 'dev', host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Shared "current reading" for the Health Monitoring System
+main_simulator.py writes the latest vitals into a small memory-mapped file
+and app.py reads them back, so /api/current needs no database query
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+
+CURRENT_READING_FILE = 'current_reading.bin'
+
+# seq, timestamp (epoch seconds), heart_rate, spo2, is_alert
+LAYOUT = struct.Struct('<Qdii?')
+SEQ = struct.Struct('<Q')
+SIZE = 32
+
+# Readings older than this are ignored (the simulator publishes every
+# second, so a stale value means it has stopped)
+MAX_AGE = 5
+
+class CurrentReadingWriter:
+    """Publishes the latest reading to the shared file"""
+    def __init__(self, path=CURRENT_READING_FILE):
+        with open(path, 'a+b') as f:
+            f.truncate(SIZE)
+            self.buf = mmap.mmap(f.fileno(), SIZE)
+        # Continue from the last even sequence number left in the file
+        self.seq = SEQ.unpack_from(self.buf)[0] & ~1
+        # The monitor loop and the button thread both publish readings
+        self.lock = threading.Lock()
+        
+    def write(self, hr, spo2, status):
+        """Store a reading; readers retry while seq is odd (mid-write)"""
+        with self.lock:
+            SEQ.pack_into(self.buf, 0, self.seq + 1)
+            LAYOUT.pack_into(self.buf, 0, self.seq + 1, time.time(),
+                             hr, spo2, status == "Alert")
+            self.seq += 2
+            SEQ.pack_into(self.buf, 0, self.seq)
+        
+    def close(self):
+        self.buf.close()
+
+_reader_buf = None
+
+def read_current_reading(path=CURRENT_READING_FILE, retries=5):
+    """Return the latest published reading as a dict, or None if unavailable"""
+    global _reader_buf
+    if _reader_buf is None:
+        if not os.path.exists(path) or os.path.getsize(path) < SIZE:
+            return None
+        with open(path, 'rb') as f:
+            _reader_buf = mmap.mmap(f.fileno(), SIZE, access=mmap.ACCESS_READ)
+            
+    for _ in range(retries):
+        seq, ts, hr, spo2, is_alert = LAYOUT.unpack_from(_reader_buf)
+        if seq == 0:
+            return None  # Nothing published yet
+        if seq % 2 == 0 and SEQ.unpack_from(_reader_buf)[0] == seq:
+            if time.time() - ts > MAX_AGE:
+                return None
+            return {
+                'heart_rate': hr,
+                'spo2': spo2,
+                'status': "Alert" if is_alert else "Normal",
+                'timestamp': datetime.fromtimestamp(ts, timezone.utc)
+            }
+    return None
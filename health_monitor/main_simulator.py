@@ -8,11 +8,15 @@ Can run on any computer or online Python environment
 import time
 import random
 import json
+import sched
 import sqlite3
 import threading
 from datetime import datetime, timedelta
 import os
 
+from current_reading import CurrentReadingWriter
+from utc_time import utc_cutoff, utc_today
+
 # Simulated GPIO class (replaces RPi.GPIO)
 class SimulatedGPIO:
     BCM = "BCM"
@@ -62,6 +66,9 @@ RED_LED = 17
 GREEN_LED = 27
 BUTTON = 22
 
+# Database file, shared with the dashboard
+DATABASE = 'health_data.db'
+
 # Health thresholds
 HR_MIN = 60
 HR_MAX = 100
@@ -121,6 +128,9 @@ class HealthMonitor:
         # Initialize database
         self.init_database()
         
+        # Latest reading, shared with the dashboard's /api/current
+        self.live_reading = CurrentReadingWriter()
+        
         # Current readings
         self.current_hr = 75
         self.current_spo2 = 98
@@ -136,8 +146,17 @@ class HealthMonitor:
         
     def init_database(self):
         """Initialize SQLite database"""
-        self.conn = sqlite3.connect('health_data.db', check_same_thread=False)
-        cursor = self.conn.cursor()
+        # Writer connection, used only for schema setup and save_to_database
+        self.write_conn = sqlite3.connect(DATABASE, check_same_thread=False)
+        cursor = self.write_conn.cursor()
+        
+        # WAL lets the dashboard read while we write; NORMAL sync only
+        # fsyncs at checkpoints instead of on every commit
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute('PRAGMA cache_size=-20000')
+        
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS readings (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -147,7 +166,42 @@ class HealthMonitor:
                 status TEXT
             )
         ''')
-        self.conn.commit()
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_readings_ts
+            ON readings(timestamp DESC)
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_rollup (
+                day DATE PRIMARY KEY,
+                count INTEGER,
+                sum_hr INTEGER,
+                sum_spo2 INTEGER,
+                min_hr INTEGER,
+                max_hr INTEGER,
+                min_spo2 INTEGER,
+                max_spo2 INTEGER,
+                alerts INTEGER
+            )
+        ''')
+        
+        # Backfill the rollup from existing readings on first use
+        if cursor.execute('SELECT 1 FROM daily_rollup LIMIT 1').fetchone() is None:
+            cursor.execute('''
+                INSERT INTO daily_rollup
+                SELECT substr(timestamp, 1, 10), COUNT(*),
+                       SUM(heart_rate), SUM(spo2),
+                       MIN(heart_rate), MAX(heart_rate),
+                       MIN(spo2), MAX(spo2),
+                       SUM(status = 'Alert')
+                FROM readings
+                GROUP BY substr(timestamp, 1, 10)
+            ''')
+        self.write_conn.commit()
+        
+        # Separate read-only connection for queries; under WAL it reads the
+        # last committed data without waiting on the writer
+        self.read_conn = sqlite3.connect(f'file:{DATABASE}?mode=ro', uri=True,
+                                         check_same_thread=False)
         print("✅ Database initialized")
         
     def read_sensors(self):
@@ -161,27 +215,41 @@ class HealthMonitor:
         """Check if vitals are within normal range"""
         is_normal = (HR_MIN <= hr <= HR_MAX and spo2 >= SPO2_MIN)
         
-        if is_normal:
-            GPIO.output(GREEN_LED, True)
-            GPIO.output(RED_LED, False)
-            status = "Normal"
-        else:
-            GPIO.output(RED_LED, True)
-            GPIO.output(GREEN_LED, False)
-            status = "Alert"
+        GPIO.output(GREEN_LED, is_normal)
+        GPIO.output(RED_LED, not is_normal)
+        status = "Normal" if is_normal else "Alert"
+        if not is_normal:
             self.alert_count += 1
-            
+        
         self.current_status = status
+        self.live_reading.write(hr, spo2, status)
         return status
         
     def save_to_database(self, hr, spo2, status):
         """Save reading to database"""
-        cursor = self.conn.cursor()
+        cursor = self.write_conn.cursor()
         cursor.execute('''
             INSERT INTO readings (heart_rate, spo2, status)
             VALUES (?, ?, ?)
         ''', (hr, spo2, status))
-        self.conn.commit()
+        
+        # Keep today's aggregates current so stats never rescan readings
+        cursor.execute('''
+            INSERT INTO daily_rollup
+                (day, count, sum_hr, sum_spo2,
+                 min_hr, max_hr, min_spo2, max_spo2, alerts)
+            VALUES (DATE('now'), 1, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                count = count + 1,
+                sum_hr = sum_hr + excluded.sum_hr,
+                sum_spo2 = sum_spo2 + excluded.sum_spo2,
+                min_hr = MIN(min_hr, excluded.min_hr),
+                max_hr = MAX(max_hr, excluded.max_hr),
+                min_spo2 = MIN(min_spo2, excluded.min_spo2),
+                max_spo2 = MAX(max_spo2, excluded.max_spo2),
+                alerts = alerts + excluded.alerts
+        ''', (hr, spo2, hr, hr, spo2, spo2, int(status == "Alert")))
+        self.write_conn.commit()
         self.reading_count += 1
         
     def send_to_cloud(self, hr, spo2):
@@ -224,16 +292,16 @@ class HealthMonitor:
             
     def daily_summary(self):
         """Calculate and display daily summary"""
-        cursor = self.conn.cursor()
+        cursor = self.read_conn.cursor()
         
         # Get today's data
         cursor.execute('''
-            SELECT AVG(heart_rate), AVG(spo2), COUNT(*), 
-                   MIN(heart_rate), MAX(heart_rate),
-                   MIN(spo2), MAX(spo2)
-            FROM readings
-            WHERE DATE(timestamp) = DATE('now')
-        ''')
+            SELECT sum_hr * 1.0 / count, sum_spo2 * 1.0 / count, count,
+                   min_hr, max_hr,
+                   min_spo2, max_spo2
+            FROM daily_rollup
+            WHERE day = ?
+        ''', (utc_today(),))
         result = cursor.fetchone()
         
         if result and result[2] > 0:
@@ -270,48 +338,52 @@ class HealthMonitor:
         print("Monitoring vital signs...")
         print("Simulating sensor readings...\n")
         
-        last_display_time = 0
-        last_summary_time = time.time()
+        scheduler = sched.scheduler(time.monotonic, time.sleep)
         
-        while self.running:
-            current_time = time.time()
-            
-            # Read sensors every second
-            if current_time - last_display_time >= 1:
-                hr, spo2 = self.read_sensors()
-                status = self.check_vitals(hr, spo2)
-                
-                # Display current readings
-                timestamp = datetime.now().strftime("%H:%M:%S")
-                status_icon = "✅" if status == "Normal" else "⚠️"
-                
-                print(f"\r[{timestamp}] HR: {hr:3d} bpm | SpO2: {spo2:3d}% | {status_icon} {status}   ", 
-                      end='', flush=True)
-                
-                last_display_time = current_time
-                
-                # Occasionally change activity level
-                if random.random() > 0.95:
-                    self.sensor.simulate_activity()
-                    print(f"\n🏃 Activity level changed")
-                
-            # Daily summary every 60 seconds (simulating daily)
-            if current_time - last_summary_time >= 60:
-                self.daily_summary()
-                last_summary_time = current_time
-                
-            time.sleep(0.1)
+        def every(interval, action, delay=0):
+            """Run action every interval seconds (until Ctrl+C ends run())"""
+            def tick(deadline):
+                action()
+                # Schedule from the deadline, not from now, to avoid drift
+                scheduler.enterabs(deadline + interval, 1, tick, (deadline + interval,))
+            first = time.monotonic() + delay
+            scheduler.enterabs(first, 1, tick, (first,))
+        
+        # Read sensors every second
+        every(1, self.read_tick)
+        # Daily summary every 60 seconds (simulating daily)
+        every(60, self.daily_summary, delay=60)
+        
+        # Sleeps until the next deadline instead of polling
+        scheduler.run()
+        
+    def read_tick(self):
+        """Take and display one sensor reading"""
+        hr, spo2 = self.read_sensors()
+        status = self.check_vitals(hr, spo2)
+        
+        # Display current readings
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        status_icon = "✅" if status == "Normal" else "⚠️"
+        
+        print(f"\r[{timestamp}] HR: {hr:3d} bpm | SpO2: {spo2:3d}% | {status_icon} {status}   ", 
+              end='', flush=True)
+        
+        # Occasionally change activity level
+        if random.random() > 0.95:
+            self.sensor.simulate_activity()
+            print(f"\n🏃 Activity level changed")
             
     def get_recent_data(self, hours=24):
         """Get recent readings for the dashboard"""
-        cursor = self.conn.cursor()
+        cursor = self.read_conn.cursor()
         cursor.execute('''
             SELECT timestamp, heart_rate, spo2, status
             FROM readings
-            WHERE timestamp > datetime('now', '-{} hours')
+            WHERE timestamp > ?
             ORDER BY timestamp DESC
             LIMIT 100
-        '''.format(hours))
+        ''', (utc_cutoff(hours),))
         
         return cursor.fetchall()
         
@@ -328,7 +400,9 @@ class HealthMonitor:
             self.running = False
             button_thread.join()
             GPIO.cleanup()
-            self.conn.close()
+            self.read_conn.close()
+            self.write_conn.close()
+            self.live_reading.close()
             print("✅ System shutdown complete")
 
 if __name__ == "__main__":
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+UTC time helpers for the Health Monitoring System
+Readings are stored with SQLite's CURRENT_TIMESTAMP (UTC text), so time
+windows and "today" are computed in UTC here for app.py and main_simulator.py
+"""
+
+from datetime import datetime, timedelta, timezone
+
+# Same text format as SQLite's CURRENT_TIMESTAMP
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def utc_today():
+    """Today's date as stored in the daily_rollup day column"""
+    return datetime.now(timezone.utc).date().isoformat()
+
+def utc_cutoff(hours, now=None):
+    """Timestamp `hours` before now, for `WHERE timestamp > ?` windows"""
+    now = now or datetime.now(timezone.utc)
+    return (now - timedelta(hours=hours)).strftime(TIMESTAMP_FORMAT)